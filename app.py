@@ -1,11 +1,21 @@
+import time
+_APP_START = time.perf_counter()
+
 import os
+import hashlib
+import logging
+import threading
 import streamlit as st
 import pandas as pd
 import traceback
-import time
-from moviepy.editor import VideoFileClip
 from pathlib import Path
+import cache
 import detection
+import profiling
+import report
+import severity
+import tracking
+from results import columns_to_dataframe, concat_detections, results_to_dataframe
 
 # --- CONFIG & SETUP --------------------------------------------------------
 # --- CORRECTED MODEL PATH ---
@@ -14,6 +24,9 @@ MODEL_PATH = Path(r"C:\Users\risho\Documents\RoadSense\runs\train\yolo11n_finetu
 UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
 
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s: %(message)s")
+logger = logging.getLogger("app")
+
 st.set_page_config(page_title="RoadSense - Road Damage Detection", layout="centered")
 st.title("🚧 RoadSense – Road Damage Detection")
 st.write("Upload an image (.jpg/.png) or an MP4 video to get an annotated output and a damage report.")
@@ -24,6 +37,9 @@ def convert_to_web_format(input_path):
     """Converts a video to a web-friendly MP4 H.264 format using moviepy."""
     st.write("Cache miss: converting video...")
     try:
+        # moviepy is only needed for videos, so don't import it on start-up
+        from moviepy.editor import VideoFileClip
+
         clip = VideoFileClip(str(input_path))
         # Define an output path in the same directory with a suffix
         output_path = input_path.parent / f"{input_path.stem}_web.mp4"
@@ -34,57 +50,129 @@ def convert_to_web_format(input_path):
         st.warning(f"Video conversion failed: {e}. The video may not play correctly in the browser.")
         return None
 
-def results_to_dataframe(results_list):
+@st.cache_resource(show_spinner=False)
+def model_warmup():
     """
-    Converts a list of Ultralytics results objects (one per frame/image) 
-    into a single pandas DataFrame.
+    Starts loading the model and a dummy inference in the background, once per
+    process. detection.stream_detections() waits for it before predicting.
     """
-    rows = []
-    if not results_list:
-        return pd.DataFrame(columns=["Frame", "Damage Type", "Confidence", "Width", "Height", "Bbox"])
-    
-    for frame_index, frame_results in enumerate(results_list):
-        if frame_results.boxes is not None:
-            names = frame_results.names
-            for box in frame_results.boxes:
-                cls_id = int(box.cls[0])
-                conf = float(box.conf[0])
-                xyxy = box.xyxy[0].tolist()
-                x1, y1, x2, y2 = map(int, xyxy)
-                
-                rows.append([
-                    frame_index,
-                    names[cls_id], 
-                    round(conf, 3), 
-                    x2 - x1, 
-                    y2 - y1, 
-                    (x1, y1, x2, y2)
-                ])
-    
-    return pd.DataFrame(rows, columns=["Frame", "Damage Type", "Confidence", "Width", "Height", "Bbox"])
+    return detection.warmup(background=True)
 
+def upload_cache_key(uploaded_file, **params):
+    """
+    Result cache key for an upload and the detection parameters. The content
+    hash is remembered per upload in the session so reruns don't re-hash the file.
+    """
+    hashes = st.session_state.setdefault("upload_hashes", {})
+    if uploaded_file.file_id not in hashes:
+        hashes[uploaded_file.file_id] = hashlib.sha256(uploaded_file.getbuffer()).hexdigest()
+    return cache.cache_key(
+        hashes[uploaded_file.file_id].encode(),
+        detection.MODEL_PATH,
+        imgsz=detection.IMGSZ,
+        conf=detection.CONF,
+        **params,
+    )
+
+def build_pdf_report(key, df, source_path):
+    """
+    Path of the PDF report for a detection result. The report is streamed to
+    disk once per result key rather than built and cached in memory.
+    """
+    report_path = UPLOAD_DIR / f"{key[:16]}_report.pdf"
+    if not report_path.exists():
+        with st.spinner("Building PDF report..."):
+            tmp_path = report_path.with_name(f"{report_path.name}.{threading.get_ident()}.tmp")
+            report.generate_report(df, str(tmp_path), source_path=source_path)
+            os.replace(tmp_path, report_path)
+    return report_path
 
 # --- MAIN APP LOGIC ---------------------------------------------------------
 uploaded_file = st.file_uploader("Upload an image or mp4 video", type=["jpg", "jpeg", "png", "mp4"])
+show_debug = st.sidebar.checkbox("Show performance debug panel", value=False)
+
+# The page is usable from here on; load the model behind it
+if "first_paint_logged" not in st.session_state:
+    st.session_state["first_paint_logged"] = True
+    logger.info("Time to first paint: %.0f ms", (time.perf_counter() - _APP_START) * 1000)
+model_warmup()
 
 if uploaded_file is None:
     st.info("Upload a file to begin analysis.")
 else:
     input_path = UPLOAD_DIR / uploaded_file.name
-    with open(input_path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
-
     file_ext = input_path.suffix.lower()
 
+    # Video mode: infer on sampled frames and merge the same defect across frames
+    track_video = file_ext == ".mp4" and st.checkbox(
+        "Merge repeated detections of the same damage across frames (faster)", value=True
+    )
+    # High-resolution mode: tile large frames so small cracks stay visible to the model
+    sliced = st.checkbox("High-resolution mode (sliced inference, slower)", value=False)
+
+    params = {}
+    if track_video:
+        params.update(tracked=True, stride=detection.SAMPLE_STRIDE,
+                      scene_threshold=detection.SCENE_THRESHOLD, max_skip=detection.MAX_SKIP)
+    if sliced:
+        params.update(sliced=True, tile_size=detection.TILE_SIZE, overlap=detection.TILE_OVERLAP,
+                      texture_threshold=detection.TEXTURE_THRESHOLD, nms_iou=detection.NMS_IOU,
+                      merge_ios=detection.MERGE_IOS, edge_tolerance=detection.EDGE_TOLERANCE)
+
+    # Per-request stage timings; memory is only sampled when the panel is shown
+    profiler = profiling.Profiler(request=uploaded_file.name, sample_memory=show_debug)
+
     with st.spinner("Processing your file... this might take a moment."):
         try:
-            annotated_path, raw_results = detection.run_detection(str(input_path))
-            annotated_path = Path(annotated_path) # Ensure it's a Path object
-            df = results_to_dataframe(raw_results)
+            # The key stats the model weights, so it can fail like the rest
+            key = upload_cache_key(uploaded_file, **params)
+            with profiler.stage("cache_load"):
+                cached = cache.load(key)
+
+            if cached is not None:
+                # Same file, weights and predict parameters seen before: skip inference
+                df, annotated_path = cached
+            else:
+                with profiler.stage("upload_write"), open(input_path, "wb") as f:
+                    f.write(uploaded_file.getbuffer())
+
+                if file_ext == ".mp4" and (track_video or sliced):
+                    annotated_path = UPLOAD_DIR / f"{input_path.stem}_annotated.mp4"
+                    # Without tracking, infer every frame
+                    sample_args = {} if track_video else {"stride": 1, "scene_threshold": 0}
+                    detections = detection.stream_sampled_detections(
+                        input_path, annotated_path, sliced=sliced, profiler=profiler, **sample_args
+                    )
+                    if track_video:
+                        tracks = tracking.track_detections(detections)
+                        with profiler.stage("dataframe"):
+                            df = tracking.tracks_to_dataframe(tracks, detection.get_model().names)
+                    else:
+                        columns = concat_detections(detections)
+                        with profiler.stage("dataframe"):
+                            df = columns_to_dataframe(*columns)
+                elif sliced:
+                    annotated_path = UPLOAD_DIR / f"{input_path.stem}_sliced{file_ext}"
+                    frame_detections = detection.run_sliced_detection(input_path, annotated_path, profiler=profiler)
+                    with profiler.stage("dataframe"):
+                        df = results_to_dataframe([frame_detections])
+                else:
+                    # Consume the detection stream directly; the annotated file is
+                    # only complete once every frame has been processed.
+                    stream = detection.stream_detections(str(input_path), profiler=profiler)
+                    columns = concat_detections(stream)
+                    with profiler.stage("dataframe"):
+                        df = columns_to_dataframe(*columns)
+                    annotated_path = Path(stream.annotated_output_path()) # Ensure it's a Path object
+                with profiler.stage("severity"):
+                    df["Severity"] = severity.classify_severity(df)
+                with profiler.stage("cache_store"):
+                    annotated_path = cache.store(key, df, annotated_path)
 
         except Exception as e:
             st.error("An error occurred during processing.")
             st.code(traceback.format_exc())
+            profiler.finish()
             st.stop()
 
     # --- DISPLAY RESULTS ----------------------------------------------------
@@ -104,7 +192,8 @@ else:
         
         elif file_ext == ".mp4":
             st.subheader("📹 Annotated Video")
-            web_video_path = convert_to_web_format(annotated_path)
+            with profiler.stage("web_reencode"):
+                web_video_path = convert_to_web_format(annotated_path)
             display_path = web_video_path if web_video_path and web_video_path.exists() else annotated_path
             
             video_bytes = display_path.read_bytes()
@@ -137,5 +226,33 @@ else:
         ).reset_index()
         st.subheader("📋 Summary by Damage Type")
         st.table(summary)
+
+        if st.button("Generate PDF Report"):
+            # Thumbnails are cropped from the original upload, which isn't
+            # written to disk on a cache hit
+            input_path.write_bytes(uploaded_file.getbuffer())
+            with open(build_pdf_report(key, df, str(input_path)), "rb") as report_file:
+                st.download_button(
+                    label="Download PDF Report",
+                    data=report_file,
+                    file_name=f"{input_path.stem}_report.pdf",
+                    mime="application/pdf",
+                )
     else:
-        st.info("✅ No road damage was detected in the provided file.")
\ No newline at end of file
+        st.info("✅ No road damage was detected in the provided file.")
+
+    # --- PERFORMANCE DEBUG PANEL --------------------------------------------
+    profiler.finish()
+    if show_debug:
+        timings = profiler.to_dict()
+        st.sidebar.subheader("⏱ Performance")
+        st.sidebar.write(f"Total: {timings['total_seconds']:.3f}s"
+                         + (f" | Peak RSS: {timings['peak_rss_mb']} MB" if timings["peak_rss_mb"] else ""))
+        st.sidebar.table(pd.DataFrame([
+            {"Stage": name, "Seconds": round(t["seconds"], 4), "Calls": t["calls"], "Peak RSS MB": t["peak_mb"]}
+            for name, t in timings["stages"].items()
+        ]))
+        st.sidebar.download_button("Download timings (JSON)", profiler.to_json(),
+                                   file_name="timings.json", mime="application/json")
+        st.sidebar.download_button("Download timings (Prometheus)", profiler.to_prometheus(),
+                                   file_name="timings.prom", mime="text/plain")
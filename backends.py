@@ -0,0 +1,211 @@
+import argparse
+import csv
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+CONFIG_PATH = Path("config/inference.yaml")
+DATA_PATH = Path("config/data.yaml")
+BACKENDS = ("pytorch", "onnx", "openvino")
+
+DEFAULT_CONFIG = {
+    "weights": r"C:\Users\risho\Documents\RoadSense\runs\yolo11n_finetuned\weights\best.pt",
+    "backend": "pytorch",
+    "int8": False,
+    "imgsz": 416,
+    "conf": 0.25,
+    "calibration_fraction": 0.1,
+}
+
+
+def load_config(path=CONFIG_PATH):
+    """Reads the inference config, falling back to the defaults for missing keys."""
+    config = dict(DEFAULT_CONFIG)
+    path = Path(path)
+    if path.exists():
+        config.update(yaml.safe_load(path.read_text()) or {})
+
+    if config["backend"] not in BACKENDS:
+        raise ValueError(f"Unknown backend '{config['backend']}', expected one of {BACKENDS}.")
+    if config["backend"] == "pytorch" and config["int8"]:
+        raise ValueError("INT8 is only available for the onnx and openvino backends.")
+    return config
+
+
+def model_path(config):
+    """Path of the model artifact for the configured backend, named as Ultralytics exports it."""
+    weights = Path(config["weights"])
+    suffix = "_int8" if config["int8"] else ""
+    if config["backend"] == "onnx":
+        return weights.with_name(f"{weights.stem}{suffix}.onnx")
+    if config["backend"] == "openvino":
+        return weights.with_name(f"{weights.stem}{suffix}_openvino_model")
+    return weights
+
+
+def load_model(config=None):
+    """Loads the YOLO model for the configured backend."""
+    # Imported here so that importing this module doesn't pull in torch
+    from ultralytics import YOLO
+
+    config = config or load_config()
+    path = model_path(config)
+    if not path.exists():
+        raise FileNotFoundError(
+            f"Model '{path}' not found. Export it first with: "
+            f"python backends.py export --backend {config['backend']}" + (" --int8" if config["int8"] else "")
+        )
+    return YOLO(str(path), task="detect")
+
+
+# --- EXPORT -----------------------------------------------------------------
+def val_images(data=DATA_PATH, fraction=1.0):
+    """Evenly spaced sample of the val split images listed in data.yaml."""
+    data_config = yaml.safe_load(Path(data).read_text())
+    val_dir = Path(data_config["val"])
+    if not val_dir.is_absolute():
+        val_dir = Path(data_config.get("path", ".")) / val_dir
+
+    images = sorted(p for p in val_dir.rglob("*") if p.suffix.lower() in {".jpg", ".jpeg", ".png"})
+    if not images:
+        raise FileNotFoundError(f"No val images found in '{val_dir}'.")
+    count = max(1, int(len(images) * fraction))
+    return [images[i] for i in np.linspace(0, len(images) - 1, count).astype(int)]
+
+
+def _quantize_onnx(fp32_path, int8_path, images, imgsz):
+    """Static INT8 post-training quantization with ONNX Runtime, calibrated on images."""
+    import cv2
+    import onnxruntime as ort
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    from preprocess import letterbox
+
+    input_name = ort.InferenceSession(str(fp32_path), providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    class ValReader(CalibrationDataReader):
+        def __init__(self):
+            self.images = iter(images)
+
+        def get_next(self):
+            for path in self.images:
+                image = cv2.imread(str(path))
+                if image is None:
+                    continue
+                # Same preprocessing as Ultralytics: letterbox, BGR->RGB, CHW, 0-1
+                image = letterbox(image, imgsz)[0][:, :, ::-1].transpose(2, 0, 1)
+                return {input_name: np.ascontiguousarray(image, dtype=np.float32)[None] / 255.0}
+            return None
+
+    quantize_static(
+        str(fp32_path), str(int8_path), ValReader(),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+    )
+    return int8_path
+
+
+def export_backend(config, backend, int8=False, data=DATA_PATH):
+    """
+    Exports config["weights"] to the given backend and returns the artifact path.
+    INT8 exports are calibrated on config["calibration_fraction"] of the val split.
+    """
+    from ultralytics import YOLO
+
+    target = dict(config, backend=backend, int8=int8)
+    model = YOLO(config["weights"])
+    # dynamic=True keeps the batch dimension free for batch.py
+    export_args = dict(imgsz=config["imgsz"], dynamic=True, device="cpu")
+
+    if backend == "openvino":
+        # Ultralytics calibrates OpenVINO INT8 with NNCF on the val split of data
+        model.export(format="openvino", int8=int8, data=str(data),
+                     fraction=config["calibration_fraction"], **export_args)
+    elif backend == "onnx":
+        fp32_path = Path(model.export(format="onnx", **export_args))
+        if int8:
+            images = val_images(data, config["calibration_fraction"])
+            _quantize_onnx(fp32_path, model_path(target), images, config["imgsz"])
+    else:
+        raise ValueError(f"Nothing to export for backend '{backend}'.")
+
+    return model_path(target)
+
+
+# --- COMPARISON REPORT --------------------------------------------------------
+def compare_backends(config, data=DATA_PATH, out_path="runs/backends/comparison.csv"):
+    """
+    Validates every exported backend on the val split (CPU, batch 1) and writes
+    mAP per class against ms/frame, so a backend can be picked with data.
+    """
+    rows = []
+    for backend in BACKENDS:
+        for int8 in (False, True):
+            candidate = dict(config, backend=backend, int8=int8)
+            if (backend == "pytorch" and int8) or not model_path(candidate).exists():
+                continue
+
+            print(f"Validating {backend}{' INT8' if int8 else ''}...")
+            metrics = load_model(candidate).val(
+                data=str(data), imgsz=config["imgsz"], batch=1, device="cpu",
+                split="val", plots=False, verbose=False
+            )
+            row = {
+                "backend": backend,
+                "int8": int8,
+                "mAP50": round(float(metrics.box.map50), 4),
+                "mAP50-95": round(float(metrics.box.map), 4),
+            }
+            for cls_id, name in metrics.names.items():
+                row[f"{name} mAP50-95"] = round(float(metrics.box.maps[cls_id]), 4)
+            # Full per-frame latency: preprocess + inference + postprocess
+            row["ms/frame"] = round(sum(metrics.speed[k] for k in ("preprocess", "inference", "postprocess")), 2)
+            rows.append(row)
+
+    if not rows:
+        raise FileNotFoundError("No model artifacts found to compare.")
+
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(out_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    return rows, out_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export and compare RoadSense inference backends.")
+    parser.add_argument("--config", default=str(CONFIG_PATH))
+    parser.add_argument("--data", default=str(DATA_PATH))
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="Export the fine-tuned weights to a backend")
+    export_parser.add_argument("--backend", choices=BACKENDS[1:], required=True)
+    export_parser.add_argument("--int8", action="store_true", help="INT8 post-training quantization")
+
+    compare_parser = commands.add_parser("compare", help="Accuracy vs latency report of exported backends")
+    compare_parser.add_argument("--out", default="runs/backends/comparison.csv")
+
+    args = parser.parse_args()
+    config = load_config(args.config)
+
+    if args.command == "export":
+        path = export_backend(config, args.backend, args.int8, args.data)
+        print(f"✅ Exported {args.backend}{' INT8' if args.int8 else ''} model to: {path}")
+        print(f"   Set 'backend: {args.backend}' and 'int8: {str(args.int8).lower()}' in {args.config} to use it.")
+    else:
+        rows, out_path = compare_backends(config, args.data, args.out)
+        print("\n" + "="*60)
+        print(" | ".join(rows[0]))
+        for row in rows:
+            print(" | ".join(str(v) for v in row.values()))
+        print("="*60)
+        print(f"Report saved to: {out_path}")
+
+
+if __name__ == "__main__":
+    main()
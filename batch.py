@@ -0,0 +1,252 @@
+import argparse
+import hashlib
+import os
+import queue
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+import detection
+from preprocess import letterbox
+from results import FrameDetections, concat_detections
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp"}
+VIDEO_EXTS = {".mp4", ".avi", ".mov", ".mkv"}
+
+
+def collect_sources(source):
+    """
+    Returns (root, [paths]) for a directory of images/videos or a manifest
+    file (.txt/.csv) listing one path per line.
+    """
+    source = Path(source)
+    if source.is_dir():
+        paths = sorted(p for p in source.rglob("*") if p.suffix.lower() in IMAGE_EXTS | VIDEO_EXTS)
+        return source, paths
+
+    root = source.parent
+    paths = []
+    for line in source.read_text().splitlines():
+        line = line.split(",")[0].strip()
+        if not line or line.startswith("#"):
+            continue
+        path = Path(line)
+        paths.append(path if path.is_absolute() else root / path)
+    return root, paths
+
+
+def output_path_for(path, root, out_dir):
+    """
+    Per-file result path, mirroring the input layout under out_dir. Files
+    outside root (e.g. absolute paths in a manifest) go under out_dir/_external,
+    with a short hash of their full path so same-named files don't collide.
+    """
+    path = Path(path).resolve()
+    try:
+        rel = path.relative_to(Path(root).resolve())
+    except ValueError:
+        digest = hashlib.sha1(str(path).encode()).hexdigest()[:12]
+        rel = Path("_external") / f"{digest}_{path.name}"
+    return Path(out_dir) / rel.with_name(rel.name + ".npz")
+
+
+def _load_image(path, imgsz):
+    image = cv2.imread(str(path))
+    if image is None:
+        raise ValueError(f"Could not read image '{path}'.")
+    return letterbox(image, imgsz)
+
+
+def _read_video(path, imgsz, batch_size, out_queue):
+    """
+    Decodes and letterboxes a video in chunks of batch_size frames, putting
+    (path, chunk) on out_queue and (path, None) when done. If reading fails,
+    (path, exception) is put before the final (path, None).
+    """
+    cap = cv2.VideoCapture(str(path))
+    try:
+        chunk = []
+        while True:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            chunk.append(letterbox(frame, imgsz))
+            if len(chunk) == batch_size:
+                out_queue.put((path, chunk))
+                chunk = []
+        if chunk:
+            out_queue.put((path, chunk))
+    except Exception as e:
+        out_queue.put((path, e))
+    finally:
+        cap.release()
+        out_queue.put((path, None))
+
+
+def _predict_batch(frames, imgsz, conf, start_index=0):
+    """
+    Runs one batched CPU inference on letterboxed frames and maps the boxes
+    back to original frame coordinates.
+    """
+    results = detection.predict(
+        [f[0] for f in frames], imgsz=imgsz, conf=conf, batch=len(frames), device="cpu", verbose=False
+    )
+
+    records = []
+    for offset, ((_, scale, (pad_x, pad_y), (h, w)), frame_results) in enumerate(zip(frames, results)):
+        boxes = frame_results.boxes
+        xyxy = boxes.xyxy.cpu().numpy().astype(np.float32)
+        xyxy -= np.array([pad_x, pad_y, pad_x, pad_y], dtype=np.float32)
+        xyxy /= scale
+        np.clip(xyxy, 0, [w, h, w, h], out=xyxy)
+        records.append(FrameDetections(
+            start_index + offset,
+            boxes.cls.cpu().numpy().astype(np.int64),
+            boxes.conf.cpu().numpy().astype(np.float32),
+            xyxy,
+            frame_results.names,
+        ))
+    return records
+
+
+def save_detections(out_path, records):
+    """
+    Writes a file's detections as one compressed .npz with flat columns.
+    Written to a temp file first so an interrupted run never leaves a
+    half-written result that would be skipped on resume.
+    """
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    frame, cls, conf, xyxy, names = concat_detections(records)
+    names = names or detection.get_model().names
+
+    tmp_path = out_path.with_name(out_path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        np.savez_compressed(
+            f,
+            frame=frame,
+            cls=cls,
+            conf=conf,
+            xyxy=xyxy,
+            names=np.array([names[i] for i in sorted(names)]),
+            num_frames=len(records),
+        )
+    os.replace(tmp_path, out_path)
+
+
+def _flush_images(paths, futures, root, out_dir, imgsz, conf):
+    frames, done_paths = [], []
+    for path, future in zip(paths, futures):
+        try:
+            frames.append(future.result())
+            done_paths.append(path)
+        except ValueError as e:
+            print(f"⚠️ Skipping: {e}")
+    if not frames:
+        return 0
+
+    records = _predict_batch(frames, imgsz, conf)
+    for path, record in zip(done_paths, records):
+        save_detections(output_path_for(path, root, out_dir), [record._replace(frame=0)])
+    return len(records)
+
+
+def run_batch(source, out_dir="runs/batch", batch_size=16, workers=None, imgsz=416, conf=0.25):
+    """
+    Runs inference over every image/video in a directory or manifest,
+    skipping files that already have results in out_dir. Returns a dict
+    with the run statistics.
+    """
+    workers = workers or os.cpu_count() or 1
+    root, paths = collect_sources(source)
+
+    todo = [p for p in paths if not output_path_for(p, root, out_dir).exists()]
+    images = [p for p in todo if p.suffix.lower() in IMAGE_EXTS]
+    videos = [p for p in todo if p.suffix.lower() in VIDEO_EXTS]
+    print(f"{len(paths)} files found, {len(paths) - len(todo)} already done, {len(todo)} to process.")
+
+    frames_done = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # --- Images: decoded in the pool, inferred in batches ---------------
+        # Keep a couple of batches decoding ahead while the model is busy,
+        # without decoding the whole directory into memory.
+        in_flight = deque()
+        for i in range(0, len(images), batch_size):
+            batch_paths = images[i:i + batch_size]
+            in_flight.append((batch_paths, [pool.submit(_load_image, p, imgsz) for p in batch_paths]))
+            if len(in_flight) > 2:
+                frames_done += _flush_images(*in_flight.popleft(), root, out_dir, imgsz, conf)
+        while in_flight:
+            frames_done += _flush_images(*in_flight.popleft(), root, out_dir, imgsz, conf)
+
+        # --- Videos: up to `workers` decoded at once in the pool ------------
+        # Readers share one bounded queue, so decoding scales with cores while
+        # only a few chunks per reader wait for the model at any time.
+        chunks = queue.Queue(maxsize=2 * workers)
+        records, errors = {}, {}
+        for path in videos:
+            cap = cv2.VideoCapture(str(path))
+            readable = cap.isOpened()
+            cap.release()
+            if not readable:
+                print(f"⚠️ Skipping unreadable video '{path}'.")
+                continue
+            records[path] = []
+            pool.submit(_read_video, path, imgsz, batch_size, chunks)
+
+        remaining = len(records)
+        while remaining:
+            path, chunk = chunks.get()
+            if chunk is None:
+                remaining -= 1
+                # Don't save a partial video as if it were complete; it is redone on the next run
+                if path in errors:
+                    print(f"⚠️ Skipping '{path}', reading failed after {len(records[path])} frames: {errors[path]}")
+                else:
+                    save_detections(output_path_for(path, root, out_dir), records[path])
+                    frames_done += len(records[path])
+                del records[path]
+            elif isinstance(chunk, Exception):
+                errors[path] = chunk
+            else:
+                records[path].extend(_predict_batch(chunk, imgsz, conf, start_index=len(records[path])))
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        "files": len(todo),
+        "skipped": len(paths) - len(todo),
+        "frames": frames_done,
+        "seconds": round(elapsed, 2),
+        "images_per_sec": round(frames_done / elapsed, 2) if elapsed > 0 else 0.0,
+        "workers": workers,
+        "batch_size": batch_size,
+    }
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch road damage detection over images and videos.")
+    parser.add_argument("source", help="Directory of images/videos or a manifest file with one path per line")
+    parser.add_argument("--out", default="runs/batch", help="Directory for per-file .npz results")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=None, help="Decode threads (default: all cores)")
+    parser.add_argument("--imgsz", type=int, default=416)
+    parser.add_argument("--conf", type=float, default=0.25)
+    args = parser.parse_args()
+
+    stats = run_batch(args.source, args.out, args.batch_size, args.workers, args.imgsz, args.conf)
+
+    print("\n" + "="*60)
+    print(f"✅ Processed {stats['files']} files ({stats['frames']} frames) in {stats['seconds']}s")
+    print(f"   Skipped (already done): {stats['skipped']}")
+    print(f"   Throughput: {stats['images_per_sec']} images/sec "
+          f"({stats['workers']} workers, batch {stats['batch_size']})")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmarks the columnar results_to_dataframe/classify_severity path against
+the original per-box Python loops on synthetic detections.
+
+Run from the repo root:
+    python -m benchmarks.dataframe_benchmark
+    python -m benchmarks.dataframe_benchmark --sizes 10000 100000 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from results import FrameDetections, results_to_dataframe
+from severity import classify_severity
+
+NAMES = {0: "D00", 1: "D10", 2: "D20", 3: "D40"}
+
+
+def synthetic_detections(num_boxes, boxes_per_frame=8, seed=0):
+    """Builds FrameDetections records totalling num_boxes boxes."""
+    rng = np.random.default_rng(seed)
+    records = []
+    for frame in range(int(np.ceil(num_boxes / boxes_per_frame))):
+        n = min(boxes_per_frame, num_boxes - frame * boxes_per_frame)
+        xy = rng.uniform(0, 1500, size=(n, 2)).astype(np.float32)
+        wh = rng.uniform(10, 400, size=(n, 2)).astype(np.float32)
+        records.append(FrameDetections(
+            frame,
+            rng.integers(0, len(NAMES), size=n),
+            rng.uniform(0.25, 1.0, size=n).astype(np.float32),
+            np.hstack([xy, xy + wh]),
+            NAMES,
+        ))
+    return records
+
+
+# --- Original implementations, kept here for comparison ---------------------
+def legacy_results_to_dataframe(detections):
+    rows = []
+    for frame_detections in detections:
+        names = frame_detections.names
+        for cls_id, conf, xyxy in zip(frame_detections.cls, frame_detections.conf, frame_detections.xyxy):
+            x1, y1, x2, y2 = map(int, xyxy)
+            rows.append([frame_detections.frame, names[int(cls_id)], round(float(conf), 3),
+                         x2 - x1, y2 - y1, (x1, y1, x2, y2)])
+    return pd.DataFrame(rows, columns=["Frame", "Damage Type", "Confidence", "Width", "Height", "Bbox"])
+
+
+def legacy_classify_severity(df):
+    severity_map = {}
+    for i, row in df.iterrows():
+        if row["Confidence"] > 0.8:
+            severity = "High"
+        elif row["Confidence"] > 0.5:
+            severity = "Medium"
+        else:
+            severity = "Low"
+        severity_map[f"Damage {i+1}"] = severity
+    return severity_map
+
+
+def _time(fn, *args):
+    start = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'boxes':>10} | {'legacy df':>10} | {'new df':>8} | {'legacy sev':>10} | {'new sev':>8} | {'speedup':>7}")
+    print("-" * 70)
+    for size in args.sizes:
+        detections = synthetic_detections(size)
+
+        legacy_df, t_legacy_df = _time(legacy_results_to_dataframe, detections)
+        new_df, t_new_df = _time(results_to_dataframe, detections)
+        pd.testing.assert_frame_equal(legacy_df, new_df, check_dtype=False)
+
+        legacy_sev, t_legacy_sev = _time(legacy_classify_severity, legacy_df)
+        new_sev, t_new_sev = _time(classify_severity, new_df)
+        assert list(legacy_sev.values()) == new_sev.tolist()
+
+        speedup = (t_legacy_df + t_legacy_sev) / (t_new_df + t_new_sev)
+        print(f"{size:>10,} | {t_legacy_df:>9.3f}s | {t_new_df:>7.3f}s | "
+              f"{t_legacy_sev:>9.3f}s | {t_new_sev:>7.3f}s | {speedup:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
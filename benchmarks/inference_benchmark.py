@@ -0,0 +1,194 @@
+"""
+Benchmarks the detection pipeline stage by stage on synthetic images and
+videos, for every model version found in runs/ (or the given weights), so
+regressions between versions show up in the numbers.
+
+Run from the repo root:
+    python -m benchmarks.inference_benchmark
+    python -m benchmarks.inference_benchmark --width 3840 --height 2160 --frames 300 --sliced
+    python -m benchmarks.inference_benchmark --memory
+    python -m benchmarks.inference_benchmark --out bench.json --baseline previous_bench.json
+"""
+import argparse
+import json
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+import backends
+import detection
+import profiling
+from profiling import Profiler
+from results import columns_to_dataframe, concat_detections
+
+
+def synthetic_frame(width, height, rng):
+    """Grey 'asphalt' noise with a few dark crack-like lines, so tiles have texture."""
+    frame = rng.normal(110, 25, size=(height, width, 3)).clip(0, 255).astype(np.uint8)
+    for _ in range(6):
+        x1, x2 = rng.integers(0, width, size=2)
+        y1, y2 = rng.integers(height // 2, height, size=2)
+        cv2.line(frame, (int(x1), int(y1)), (int(x2), int(y2)), (30, 30, 30), int(rng.integers(2, 6)))
+    return frame
+
+
+def write_synthetic_media(out_dir, width, height, frames, images, seed=0):
+    """Writes `images` JPEGs and one MP4 of `frames` frames; returns (image paths, video path)."""
+    rng = np.random.default_rng(seed)
+    image_paths = []
+    for i in range(images):
+        path = out_dir / f"synthetic_{i}.jpg"
+        cv2.imwrite(str(path), synthetic_frame(width, height, rng))
+        image_paths.append(path)
+
+    video_path = out_dir / "synthetic.mp4"
+    writer = cv2.VideoWriter(str(video_path), cv2.VideoWriter_fourcc(*"mp4v"), 30, (width, height))
+    base = synthetic_frame(width, height, rng)
+    for i in range(frames):
+        # Scroll the same frame down to mimic forward motion
+        writer.write(np.roll(base, i * 4, axis=0))
+    writer.release()
+    return image_paths, video_path
+
+
+def find_weights():
+    """Every best.pt under runs/, i.e. every trained model version."""
+    return sorted(Path("runs").glob("**/weights/best.pt"))
+
+
+def run_source(kind, source, work_dir, sliced=False, profiler=None):
+    """Runs one synthetic source through the pipeline, timed with profiler if given."""
+    if sliced:
+        output = work_dir / f"annotated_{Path(source).name}"
+        if kind == "video":
+            detections = detection.stream_sampled_detections(
+                source, output, stride=1, scene_threshold=0, sliced=True, profiler=profiler)
+        else:
+            detections = [detection.run_sliced_detection(source, output, profiler=profiler)]
+        columns = concat_detections(detections)
+    else:
+        columns = concat_detections(
+            detection.stream_detections(str(source), profiler=profiler, project=str(work_dir / "detect")))
+    with profiling.stage(profiler, "dataframe"):
+        columns_to_dataframe(*columns)
+
+
+def peak_traced_memory(kind, source, work_dir, sliced=False):
+    """
+    Peak traced Python/NumPy memory of one run. This is a separate, untimed
+    pass: tracemalloc hooks every allocation and slows the pipeline down
+    several times, so it must never be on while stages are timed.
+    """
+    tracemalloc.start()
+    try:
+        run_source(kind, source, work_dir, sliced)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark_weights(weights, image_paths, video_path, video_frames, work_dir, sliced=False, memory=False):
+    """
+    Runs every synthetic source through the pipeline; returns stage totals and
+    fps per source kind, plus the peak traced memory with memory=True.
+    """
+    config = dict(detection.CONFIG, weights=str(weights), backend="pytorch", int8=False)
+    detection.set_model(backends.load_model(config))
+    detection.warmup(background=False)
+
+    runs = {}
+    sources = [("images", p) for p in image_paths] + [("video", video_path)]
+    for kind, source in sources:
+        profiler = Profiler(request=f"{weights}:{kind}")
+        run_source(kind, source, work_dir, sliced, profiler)
+        profiler.finish()
+
+        result = runs.setdefault(kind, {"total_seconds": 0.0, "frames": 0, "peak_traced_mb": None, "stages": {}})
+        result["total_seconds"] += profiler.total_seconds
+        result["frames"] += video_frames if kind == "video" else 1
+        for name, stage in profiler.to_dict()["stages"].items():
+            totals = result["stages"].setdefault(name, {"seconds": 0.0})
+            totals["seconds"] += stage["seconds"]
+
+        if memory:
+            peak_mb = peak_traced_memory(kind, source, work_dir, sliced) / 2**20
+            result["peak_traced_mb"] = round(max(result["peak_traced_mb"] or 0.0, peak_mb), 2)
+
+    for result in runs.values():
+        result["fps"] = round(result["frames"] / result["total_seconds"], 2) if result["total_seconds"] else None
+    return runs
+
+
+def compare(current, baseline, tolerance=0.10):
+    """Prints stages that got more than `tolerance` slower than in the baseline."""
+    regressions = 0
+    for weights, runs in current["results"].items():
+        for kind, result in runs.items():
+            old = baseline.get("results", {}).get(weights, {}).get(kind)
+            if old is None:
+                continue
+            for name, stage in result["stages"].items():
+                old_seconds = old["stages"].get(name, {}).get("seconds")
+                if old_seconds and stage["seconds"] > old_seconds * (1 + tolerance):
+                    regressions += 1
+                    print(f"⚠️ {weights} [{kind}] {name}: {old_seconds:.3f}s -> {stage['seconds']:.3f}s "
+                          f"(+{(stage['seconds'] / old_seconds - 1) * 100:.0f}%)")
+    if not regressions:
+        print(f"✅ No stage more than {tolerance:.0%} slower than the baseline.")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--weights", nargs="+", help="Weights to benchmark (default: every runs/**/weights/best.pt)")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--frames", type=int, default=90, help="Length of the synthetic video")
+    parser.add_argument("--images", type=int, default=20, help="Number of synthetic images")
+    parser.add_argument("--sliced", action="store_true", help="Benchmark sliced inference instead")
+    parser.add_argument("--memory", action="store_true",
+                        help="Also measure peak traced memory, in a separate untimed pass per source")
+    parser.add_argument("--out", default="runs/benchmarks/inference.json")
+    parser.add_argument("--baseline", help="Earlier --out file to check for regressions against")
+    args = parser.parse_args()
+
+    weights_list = [Path(w) for w in args.weights] if args.weights else find_weights()
+    if not weights_list:
+        raise SystemExit("No weights found; pass --weights path/to/best.pt")
+
+    report = {
+        "settings": {k: getattr(args, k) for k in ("width", "height", "frames", "images", "sliced", "memory")},
+        "results": {},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = Path(tmp)
+        image_paths, video_path = write_synthetic_media(work_dir, args.width, args.height, args.frames, args.images)
+        for weights in weights_list:
+            print(f"Benchmarking {weights}...")
+            report["results"][str(weights)] = benchmark_weights(
+                weights, image_paths, video_path, args.frames, work_dir, args.sliced, args.memory
+            )
+
+    print("\n" + "="*60)
+    for weights, runs in report["results"].items():
+        print(weights)
+        for kind, result in runs.items():
+            stages = ", ".join(f"{name} {s['seconds']:.3f}s" for name, s in result["stages"].items())
+            memory = f" | peak {result['peak_traced_mb']} MB traced" if result["peak_traced_mb"] is not None else ""
+            print(f"  {kind:<7} {result['fps']} fps over {result['frames']} frames | {stages}{memory}")
+    print("="*60)
+
+    out_path = Path(args.out)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    out_path.write_text(json.dumps(report, indent=2))
+    print(f"Results saved to: {out_path}")
+
+    if args.baseline:
+        compare(report, json.loads(Path(args.baseline).read_text()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+CACHE_DIR = Path("cache")
+MAX_CACHE_BYTES = 2 * 1024 ** 3  # evict least recently used entries above 2 GB
+
+_TABLE_FILE = "detections.npz"
+_META_FILE = "meta.json"
+_CHUNK_SIZE = 1024 * 1024
+_STALE_TMP_SECONDS = 60 * 60  # temp entries older than this were left by a crashed store()
+
+
+def _hash_file(path, digest):
+    with open(path, "rb") as f:
+        while chunk := f.read(_CHUNK_SIZE):
+            digest.update(chunk)
+
+
+@lru_cache(maxsize=8)
+def _weights_digest(path, mtime, size):
+    # mtime/size are part of the lru_cache key so retrained weights are re-hashed
+    digest = hashlib.sha256()
+    path = Path(path)
+    files = sorted(p for p in path.rglob("*") if p.is_file()) if path.is_dir() else [path]
+    for file in files:
+        _hash_file(file, digest)
+    return digest.hexdigest()
+
+
+def weights_digest(weights_path):
+    """Content hash of a weights file (or exported model directory)."""
+    stat = os.stat(weights_path)
+    return _weights_digest(str(weights_path), stat.st_mtime_ns, stat.st_size)
+
+
+def cache_key(data, weights_path, **params):
+    """
+    Key for a detection result: hash of the uploaded file contents, the model
+    weights and the predict parameters (imgsz, conf, ...).
+    """
+    digest = hashlib.sha256()
+    digest.update(data)
+    digest.update(weights_digest(weights_path).encode())
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def _entry_dir(key):
+    return CACHE_DIR / key[:2] / key
+
+
+def _dataframe_to_arrays(df):
+    arrays = {}
+    for column in df.columns:
+        if column == "Bbox":
+            arrays[column] = np.array(df[column].tolist(), dtype=np.int64).reshape(-1, 4)
+        else:
+            values = df[column].to_numpy()
+            # String columns come back as object arrays; store them as fixed-width
+            # unicode so the file can be loaded without pickle
+            arrays[column] = values.astype(str) if values.dtype == object else values
+    return arrays
+
+
+def _arrays_to_dataframe(arrays, columns):
+    data = {}
+    for column in columns:
+        values = arrays[column]
+        if column == "Bbox":
+            data[column] = list(map(tuple, values.tolist()))
+        elif values.dtype.kind == "U":
+            data[column] = values.astype(object)
+        else:
+            data[column] = values
+    return pd.DataFrame(data, columns=columns)
+
+
+def load(key):
+    """
+    Returns (df, annotated_path) for a cached result, or None on a miss.
+    A hit refreshes the entry's position in the LRU order.
+    """
+    entry = _entry_dir(key)
+    meta_path = entry / _META_FILE
+    if not meta_path.exists():
+        return None
+    try:
+        meta = json.loads(meta_path.read_text())
+        annotated_path = entry / meta["annotated"]
+        if not annotated_path.exists():
+            raise FileNotFoundError(annotated_path)
+        with np.load(entry / _TABLE_FILE, allow_pickle=False) as arrays:
+            df = _arrays_to_dataframe(arrays, meta["columns"])
+    except (OSError, KeyError, ValueError):
+        # store() never overwrites an entry, so drop an unreadable one
+        shutil.rmtree(entry, ignore_errors=True)
+        return None
+
+    os.utime(meta_path)
+    return df, annotated_path
+
+
+def store(key, df, annotated_path):
+    """
+    Stores the detection table and a copy of the annotated media under key,
+    then evicts old entries if the cache is over MAX_CACHE_BYTES.
+    Returns the path of the cached annotated file.
+    """
+    annotated_path = Path(annotated_path)
+    entry = _entry_dir(key)
+    # Unique per call: Streamlit sessions are threads of the same process
+    entry.parent.mkdir(parents=True, exist_ok=True)
+    tmp_entry = Path(tempfile.mkdtemp(prefix=f"{key}.tmp", dir=entry.parent))
+
+    with open(tmp_entry / _TABLE_FILE, "wb") as f:
+        np.savez_compressed(f, **_dataframe_to_arrays(df))
+    shutil.copy2(annotated_path, tmp_entry / annotated_path.name)
+    meta = {
+        "columns": list(df.columns),
+        "annotated": annotated_path.name,
+        "created": time.time(),
+    }
+    (tmp_entry / _META_FILE).write_text(json.dumps(meta))
+
+    # Move the complete entry into place so readers never see a partial one.
+    # An existing entry is never deleted here, another session may be reading it.
+    try:
+        os.replace(tmp_entry, entry)
+    except OSError:
+        shutil.rmtree(tmp_entry, ignore_errors=True)
+        if not (entry / _META_FILE).exists():
+            raise
+        # Another session stored the same key first; its entry is equivalent
+
+    evict(MAX_CACHE_BYTES)
+    return entry / annotated_path.name
+
+
+def evict(max_bytes=MAX_CACHE_BYTES):
+    """Deletes least recently used entries until the cache fits in max_bytes."""
+    # Temp dirs are still being written by store(), unless a crash left them behind
+    for tmp_entry in CACHE_DIR.glob("*/*.tmp*"):
+        try:
+            if time.time() - tmp_entry.stat().st_mtime > _STALE_TMP_SECONDS:
+                shutil.rmtree(tmp_entry, ignore_errors=True)
+        except OSError:
+            pass
+
+    entries = []
+    for meta_path in CACHE_DIR.glob(f"*/*/{_META_FILE}"):
+        entry = meta_path.parent
+        if ".tmp" in entry.name:
+            continue
+        size = sum(p.stat().st_size for p in entry.iterdir() if p.is_file())
+        entries.append((meta_path.stat().st_mtime, size, entry))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, entry in sorted(entries, key=lambda e: e[0]):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= size
@@ -1,33 +1,248 @@
+import logging
 import os
-from ultralytics import YOLO
+import threading
+import time
+from pathlib import Path
 
-# --- UPDATED MODEL PATH ---
-MODEL_PATH = r"C:\Users\risho\Documents\RoadSense\runs\yolo11n_finetuned\weights\best.pt"
+import cv2
+import numpy as np
 
-# Load the YOLO model once when the module is imported
-model = YOLO(MODEL_PATH)
+import backends
+import profiling
+from results import FrameDetections
+from tracking import iou_matrix
 
-def run_detection(video_path):
+# Model path, backend and predict parameters come from config/inference.yaml
+CONFIG = backends.load_config()
+MODEL_PATH = backends.model_path(CONFIG)
+
+# Predict parameters, matching the training configuration
+IMGSZ = CONFIG["imgsz"]
+CONF = CONFIG["conf"]
+
+logger = logging.getLogger(__name__)
+
+# The model is loaded on first use, not at import, so importing this module
+# (app start-up, tests, batch.py --help) doesn't pay for torch + weights
+_model = None
+_model_lock = threading.Lock()
+_warmup_thread = None
+
+# Every Streamlit session shares the one model and its predictor, and
+# Model.predict() rewrites the predictor's args (save, batch, save_dir, ...)
+# before the predictor takes its own lock. Each predict call, and each
+# stream=True iteration as a whole, therefore runs under this lock.
+_inference_lock = threading.Lock()
+
+# Timestamps of the last Ultralytics predictor callbacks, used to split a
+# predict() iteration into decode / inference / annotate+encode stages.
+# Callbacks run in the thread iterating the predict() stream, so the marks
+# are kept per thread.
+_predict_marks = threading.local()
+_PREDICT_EVENTS = ("on_predict_batch_start", "on_predict_postprocess_end", "on_predict_batch_end")
+
+
+def _mark(event):
+    setattr(_predict_marks, event, time.perf_counter())
+
+
+def _instrument(model):
+    for event in _PREDICT_EVENTS:
+        model.add_callback(event, lambda predictor, event=event: _mark(event))
+    return model
+
+
+def get_model():
+    """Returns the process-wide YOLO model, loading it on first call."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                start = time.perf_counter()
+                _model = _instrument(backends.load_model(CONFIG))
+                logger.info("Loaded %s model '%s' in %.0f ms",
+                            CONFIG["backend"], MODEL_PATH, (time.perf_counter() - start) * 1000)
+    return _model
+
+
+def set_model(model):
+    """Replaces the process-wide model, e.g. to benchmark other weights."""
+    global _model
+    _wait_for_warmup()
+    with _model_lock:
+        _model = _instrument(model)
+    return _model
+
+
+def predict(source, **kwargs):
+    """model.predict() under the inference lock; not for stream=True (see DetectionStream)."""
+    with _inference_lock:
+        return get_model().predict(source, **kwargs)
+
+
+def warmup(background=True):
     """
-    Runs YOLO detection on a video, returns the path of the annotated video,
-    and the raw detection results for ALL frames.
-    """
-    # Run prediction with image size matching the training configuration
-    results_list = model.predict(
-        source=video_path,
-        imgsz=416,  # <-- Added to match your new training
-        save=True,
-        save_txt=True,
-        conf=0.25,
-        project="runs/detect"
+    Loads the model and runs one dummy inference so the first real request
+    doesn't pay for model loading and backend initialization. With
+    background=True this runs in a daemon thread, which is returned.
+    """
+    global _warmup_thread
+
+    def _run():
+        start = time.perf_counter()
+        predict(np.zeros((IMGSZ, IMGSZ, 3), dtype=np.uint8), imgsz=IMGSZ, conf=CONF, verbose=False)
+        logger.info("Warm-up inference done in %.0f ms", (time.perf_counter() - start) * 1000)
+
+    if not background:
+        _run()
+        return None
+
+    with _model_lock:
+        if _warmup_thread is None:
+            _warmup_thread = threading.Thread(target=_run, name="model-warmup", daemon=True)
+            _warmup_thread.start()
+    return _warmup_thread
+
+
+def _wait_for_warmup():
+    # The predictor isn't safe to share between threads, so never predict
+    # while the warm-up inference is still running
+    if _warmup_thread is not None:
+        _warmup_thread.join()
+
+
+def _to_frame_detections(frame_index, frame_results):
+    """Keeps only the box arrays of an Ultralytics Results object."""
+    boxes = frame_results.boxes
+    if boxes is None or len(boxes) == 0:
+        return FrameDetections(
+            frame_index,
+            np.empty(0, dtype=np.int64),
+            np.empty(0, dtype=np.float32),
+            np.empty((0, 4), dtype=np.float32),
+            frame_results.names,
+        )
+
+    return FrameDetections(
+        frame_index,
+        boxes.cls.cpu().numpy().astype(np.int64),
+        boxes.conf.cpu().numpy().astype(np.float32),
+        boxes.xyxy.cpu().numpy().astype(np.float32),
+        frame_results.names,
     )
 
-    if not results_list:
-        raise RuntimeError("Detection failed, no results were produced.")
 
-    first_frame_results = results_list[0]
-    output_dir = first_frame_results.save_dir
-    
+def _log_first_inference(source, start):
+    # Time from the start of a request to its first inference result, in every mode
+    logger.info("First inference for '%s' ready in %.0f ms",
+                os.path.basename(str(source)), (time.perf_counter() - start) * 1000)
+
+
+def _add_speed(profiler, results):
+    # Ultralytics measures preprocess/inference/postprocess per image, in ms
+    if profiler is not None:
+        for name in ("preprocess", "inference", "postprocess"):
+            profiler.add(name, sum((r.speed.get(name) or 0.0) for r in results) / 1000)
+
+
+def _save_labels(frame_results, frame_index, video_path, save_dir, per_frame):
+    """Writes YOLO-format labels the same way predict(save_txt=True) does."""
+    stem = os.path.splitext(os.path.basename(video_path))[0]
+    if per_frame:
+        stem = f"{stem}_{frame_index + 1}"
+    labels_dir = Path(save_dir) / "labels"
+    labels_dir.mkdir(parents=True, exist_ok=True)
+    frame_results.save_txt(labels_dir / f"{stem}.txt")
+
+
+class DetectionStream:
+    """
+    Iterable returned by stream_detections(). Once iteration has started,
+    save_dir is the directory this prediction writes its annotated output to;
+    it is taken from the results themselves, not from the shared predictor,
+    which another request may reuse once this stream has finished.
+    """
+
+    def __init__(self, video_path, profiler=None, project="runs/detect"):
+        self.video_path = video_path
+        self.profiler = profiler
+        self.project = project
+        self.save_dir = None
+
+    def __iter__(self):
+        _wait_for_warmup()
+        start = time.perf_counter()
+        # The lock is held until the stream is exhausted or closed, so no other
+        # request can change the predictor's args while frames are still coming
+        with _inference_lock:
+            yield from self._frames(start)
+
+    def _frames(self, start):
+        video_path, profiler = self.video_path, self.profiler
+        model = get_model()
+
+        # stream=True makes predict() a generator instead of a list of Results.
+        # Labels are written here rather than with save_txt=True so that writing
+        # them can be timed separately from encoding the annotated video.
+        results = iter(model.predict(
+            source=video_path,
+            imgsz=IMGSZ,  # <-- Added to match your new training
+            save=True,
+            conf=CONF,
+            project=self.project,
+            stream=True,
+        ))
+
+        frame_count = 0
+        per_frame = False
+        while True:
+            resumed = time.perf_counter()
+            frame_results = next(results, None)
+            if frame_results is None:
+                break
+            if frame_count == 0:
+                _log_first_inference(video_path, start)
+                self.save_dir = frame_results.save_dir
+                per_frame = model.predictor.dataset.mode != "image"
+
+            if profiler is not None:
+                marks = _predict_marks
+                # decode includes predictor/source setup on the first frame
+                profiler.add("decode", marks.on_predict_batch_start - resumed)
+                _add_speed(profiler, [frame_results])
+                profiler.add("annotate_encode", marks.on_predict_batch_end - marks.on_predict_postprocess_end)
+
+            with profiling.stage(profiler, "save_txt"):
+                _save_labels(frame_results, frame_count, video_path, self.save_dir, per_frame)
+
+            yield _to_frame_detections(frame_count, frame_results)
+            frame_count += 1
+
+        if frame_count == 0:
+            raise RuntimeError("Detection failed, no results were produced.")
+
+    def annotated_output_path(self):
+        """annotated_output_path() for this stream; only valid once it has been consumed."""
+        if self.save_dir is None:
+            raise RuntimeError("The detection stream has not been run yet.")
+        return annotated_output_path(self.video_path, self.save_dir)
+
+
+def stream_detections(video_path, profiler=None, project="runs/detect"):
+    """
+    Runs YOLO detection on an image or video and yields one FrameDetections
+    per frame. The annotated output is written incrementally by Ultralytics,
+    so memory stays flat no matter how long the video is. Returns a
+    DetectionStream, which also knows where the annotated output went.
+
+    With a profiling.Profiler, time is split into decode, preprocess,
+    inference, postprocess, annotate_encode and save_txt stages.
+    """
+    return DetectionStream(video_path, profiler=profiler, project=project)
+
+
+def annotated_output_path(video_path, output_dir):
+    """Returns the path of the annotated file written for video_path into output_dir."""
     video_basename = os.path.basename(video_path)
     output_path = os.path.join(output_dir, video_basename)
 
@@ -40,5 +255,285 @@ def run_detection(video_path):
         else:
             raise FileNotFoundError(f"Annotated video not found in '{output_dir}'.")
 
-    # Return the output path AND the ENTIRE list of frame results
-    return output_path, results_list
\ No newline at end of file
+    return output_path
+
+
+# --- SAMPLED VIDEO MODE -----------------------------------------------------
+# Defaults for stream_sampled_detections()
+SAMPLE_STRIDE = 3        # infer at most every 3rd frame (10 fps for a 30 fps video)
+SCENE_THRESHOLD = 2.0    # mean abs grey-level change below which the scene counts as unchanged
+MAX_SKIP = 30            # never go longer than this many frames without inference
+
+
+def _scene_signature(frame):
+    # Tiny greyscale thumbnail; cheap enough to compute for every candidate frame
+    grey = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(grey, (32, 18), interpolation=cv2.INTER_AREA).astype(np.float32)
+
+
+def draw_detections(frame, frame_detections):
+    """Draws boxes and labels of a FrameDetections onto frame (in place)."""
+    names = frame_detections.names
+    for cls_id, conf, xyxy in zip(frame_detections.cls, frame_detections.conf, frame_detections.xyxy):
+        x1, y1, x2, y2 = map(int, xyxy)
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 2)
+        cv2.putText(frame, f"{names[int(cls_id)]} {conf:.2f}", (x1, max(y1 - 5, 12)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1, cv2.LINE_AA)
+    return frame
+
+
+def stream_sampled_detections(video_path, output_path, stride=SAMPLE_STRIDE,
+                              scene_threshold=SCENE_THRESHOLD, max_skip=MAX_SKIP, sliced=False, profiler=None):
+    """
+    Runs detection on adaptively sampled video frames and yields a
+    FrameDetections for each frame that was inferred (frame = true index).
+
+    A frame is inferred when at least `stride` frames have passed since the
+    last inference AND the scene has changed since then (or `max_skip`
+    frames have passed). Every frame is still written to output_path, with
+    the most recent detections drawn on it. With sliced=True each inferred
+    frame goes through detect_sliced() instead of a single full-frame pass.
+    """
+    start = time.perf_counter()
+    _wait_for_warmup()
+
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise RuntimeError(f"Could not open video '{video_path}'.")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    writer = cv2.VideoWriter(str(output_path), cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+
+    last_detections = None
+    last_signature = None
+    last_inferred = -max_skip
+    frame_index = 0
+    inferred = 0
+    try:
+        while True:
+            with profiling.stage(profiler, "decode"):
+                ok, frame = cap.read()
+            if not ok:
+                break
+
+            since_last = frame_index - last_inferred
+            if since_last >= stride:
+                signature = _scene_signature(frame)
+                unchanged = (
+                    last_signature is not None
+                    and since_last < max_skip
+                    and float(np.mean(np.abs(signature - last_signature))) < scene_threshold
+                )
+                if not unchanged:
+                    if sliced:
+                        last_detections = detect_sliced(frame, frame_index, profiler=profiler)
+                    else:
+                        frame_results = predict(frame, imgsz=IMGSZ, conf=CONF, verbose=False)[0]
+                        _add_speed(profiler, [frame_results])
+                        last_detections = _to_frame_detections(frame_index, frame_results)
+                    if inferred == 0:
+                        _log_first_inference(video_path, start)
+                    last_signature = signature
+                    last_inferred = frame_index
+                    inferred += 1
+                    yield last_detections
+
+            with profiling.stage(profiler, "annotate_encode"):
+                writer.write(draw_detections(frame, last_detections) if last_detections is not None else frame)
+            frame_index += 1
+    finally:
+        cap.release()
+        writer.release()
+
+    if frame_index == 0:
+        raise RuntimeError("Detection failed, no frames could be read.")
+    logger.info("Sampled video mode: inferred %d of %d frames", inferred, frame_index)
+
+
+# --- SLICED INFERENCE -------------------------------------------------------
+# Hairline cracks in 4K frames shrink below a few pixels when the whole frame
+# is resized to IMGSZ, so large frames are cut into overlapping tiles that are
+# each resized far less.
+TILE_SIZE = 640            # tile side in pixels of the original frame
+TILE_OVERLAP = 0.2         # fraction of a tile shared with its neighbour
+TEXTURE_THRESHOLD = 25.0   # Laplacian variance below which a tile is skipped (sky, car hood)
+NMS_IOU = 0.5
+MERGE_IOS = 0.5            # overlap (of the smaller box) above which boxes split by a tile edge are merged
+EDGE_TOLERANCE = 4         # a box ending this close (px) to an inner tile edge was cut by it
+
+
+def tile_offsets(height, width, tile_size=TILE_SIZE, overlap=TILE_OVERLAP):
+    """Top-left (x, y) corners of overlapping tiles covering a frame; edge tiles are shifted inwards."""
+    step = max(int(tile_size * (1 - overlap)), 1)
+
+    def _starts(length):
+        if length <= tile_size:
+            return [0]
+        starts = list(range(0, length - tile_size + 1, step))
+        if starts[-1] + tile_size < length:
+            starts.append(length - tile_size)
+        return starts
+
+    return [(x, y) for y in _starts(height) for x in _starts(width)]
+
+
+def has_texture(tile, threshold=TEXTURE_THRESHOLD):
+    """
+    Cheap precheck on a 4x downscaled greyscale tile: flat regions have almost
+    no high-frequency content, so their Laplacian variance is low.
+    """
+    grey = cv2.cvtColor(tile, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(grey, None, fx=0.25, fy=0.25, interpolation=cv2.INTER_AREA)
+    return float(cv2.Laplacian(small, cv2.CV_32F).var()) >= threshold
+
+
+def class_aware_nms(xyxy, conf, cls, iou_threshold=NMS_IOU):
+    """Indices of the boxes kept by greedy NMS, applied separately per class."""
+    # Shift each class to its own region so boxes of different classes never overlap
+    offset = (cls.astype(np.float32) * (float(xyxy.max()) + 1))[:, None]
+    boxes = xyxy + offset
+    order = np.argsort(-conf)
+    keep = []
+    while order.size:
+        best = order[0]
+        keep.append(best)
+        ious = iou_matrix(boxes[best:best + 1], boxes[order[1:]])[0]
+        order = order[1:][ious <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+def cut_by_tile_edge(xyxy, origins, tile_size, height, width, tolerance=EDGE_TOLERANCE):
+    """
+    Which boxes (in frame coordinates) end within tolerance pixels of an edge
+    of their own tile that isn't also a frame edge, i.e. may continue in the
+    neighbouring tile. origins holds each box's tile (x, y); None marks boxes
+    from the full-frame pass, which are never cut.
+    """
+    cut = np.zeros(len(xyxy), dtype=bool)
+    for i, (box, origin) in enumerate(zip(xyxy, origins)):
+        if origin is None:
+            continue
+        x, y = origin
+        right, bottom = min(x + tile_size, width), min(y + tile_size, height)
+        cut[i] = ((x > 0 and box[0] - x <= tolerance) or (y > 0 and box[1] - y <= tolerance)
+                  or (right < width and right - box[2] <= tolerance)
+                  or (bottom < height and bottom - box[3] <= tolerance))
+    return cut
+
+
+def merge_split_boxes(xyxy, conf, cls, tile, cut, ios_threshold=MERGE_IOS):
+    """
+    Greedily merges boxes that one defect left in neighbouring tiles, e.g. a
+    long crack cut at a tile edge, which NMS keeps because their IoU is low.
+    Only boxes cut by a tile edge (see cut_by_tile_edge()) take part: two of
+    the same class from different tiles are replaced by their union when
+    they intersect and, along one axis, the intersection covers at least
+    ios_threshold of the smaller box (intersection over smaller). The merged
+    box keeps the highest confidence. Other boxes, including those of the
+    full-frame pass, are left to NMS. Returns (xyxy, conf, cls).
+    """
+    order = np.argsort(-conf)
+    merged_xyxy, merged_conf, merged_cls = [], [], []
+    while order.size:
+        best, order = order[0], order[1:]
+        box = xyxy[best].copy()
+        tiles = {tile[best]}
+        grew = bool(cut[best])
+        while grew and order.size:
+            # Intersection extents along x and y against every remaining box
+            rest = xyxy[order]
+            inter_w = np.minimum(box[2], rest[:, 2]) - np.maximum(box[0], rest[:, 0])
+            inter_h = np.minimum(box[3], rest[:, 3]) - np.maximum(box[1], rest[:, 1])
+            ios_x = inter_w / np.maximum(np.minimum(box[2] - box[0], rest[:, 2] - rest[:, 0]), 1e-9)
+            ios_y = inter_h / np.maximum(np.minimum(box[3] - box[1], rest[:, 3] - rest[:, 1]), 1e-9)
+            match = (cut[order] & (cls[order] == cls[best]) & ~np.isin(tile[order], list(tiles))
+                     & (inter_w > 0) & (inter_h > 0) & (np.maximum(ios_x, ios_y) >= ios_threshold))
+            grew = bool(match.any())
+            if grew:
+                box[:2] = np.minimum(box[:2], rest[match, :2].min(axis=0))
+                box[2:] = np.maximum(box[2:], rest[match, 2:].max(axis=0))
+                tiles.update(tile[order[match]].tolist())
+                order = order[~match]
+        merged_xyxy.append(box)
+        merged_conf.append(conf[best])
+        merged_cls.append(cls[best])
+
+    if not merged_xyxy:
+        return xyxy, conf, cls
+    return np.stack(merged_xyxy), np.array(merged_conf, dtype=conf.dtype), np.array(merged_cls, dtype=cls.dtype)
+
+
+def detect_sliced(frame, frame_index=0, tile_size=TILE_SIZE, overlap=TILE_OVERLAP,
+                  texture_threshold=TEXTURE_THRESHOLD, iou_threshold=NMS_IOU, full_frame=True, profiler=None):
+    """
+    Sliced inference on one BGR frame: textured tiles (plus, with full_frame,
+    the whole frame for large defects) run as a single batch, and the tile
+    boxes are mapped back to frame coordinates, deduplicated with class-aware
+    NMS and merged across tile edges with merge_split_boxes().
+    """
+    height, width = frame.shape[:2]
+    # A frame that fits in one tile would otherwise be inferred twice, as its
+    # only tile and again as the full frame
+    single_tile = height <= tile_size and width <= tile_size
+    with profiling.stage(profiler, "tiling"):
+        offsets = [] if single_tile and full_frame else [
+            (x, y) for x, y in tile_offsets(height, width, tile_size, overlap)
+            if has_texture(frame[y:y + tile_size, x:x + tile_size], texture_threshold)
+        ]
+    batch = [frame[y:y + tile_size, x:x + tile_size] for x, y in offsets]
+    if full_frame:
+        batch.append(frame)
+        offsets.append((0, 0))
+
+    model = get_model()
+    if not batch:
+        return FrameDetections(frame_index, np.empty(0, np.int64), np.empty(0, np.float32),
+                               np.empty((0, 4), np.float32), model.names)
+
+    results = predict(batch, imgsz=IMGSZ, conf=CONF, batch=len(batch), verbose=False)
+    _add_speed(profiler, results)
+    tiles = [_to_frame_detections(frame_index, r) for r in results]
+    xyxy = np.concatenate([t.xyxy + np.array([x, y, x, y], dtype=np.float32) for t, (x, y) in zip(tiles, offsets)])
+    conf = np.concatenate([t.conf for t in tiles])
+    cls = np.concatenate([t.cls for t in tiles])
+    tile = np.concatenate([np.full(len(t.cls), i) for i, t in enumerate(tiles)])
+    # The full-frame pass, if any, is the last entry of the batch
+    origins = [None if full_frame and i == len(tiles) - 1 else offsets[i] for i in tile]
+
+    with profiling.stage(profiler, "merge"):
+        keep = class_aware_nms(xyxy, conf, cls, iou_threshold) if len(cls) else np.empty(0, np.int64)
+        cut = cut_by_tile_edge(xyxy[keep], [origins[i] for i in keep], tile_size, height, width)
+        merged_xyxy, merged_conf, merged_cls = merge_split_boxes(xyxy[keep], conf[keep], cls[keep], tile[keep], cut)
+        if len(merged_cls) < len(keep):
+            # A rejoined box may now duplicate a full-frame box
+            final = class_aware_nms(merged_xyxy, merged_conf, merged_cls, iou_threshold)
+            merged_xyxy, merged_conf, merged_cls = merged_xyxy[final], merged_conf[final], merged_cls[final]
+    logger.debug("Sliced inference: %d of %d tiles textured, %d boxes kept of %d, %d after merging",
+                 len(offsets) - full_frame, len(tile_offsets(height, width, tile_size, overlap)),
+                 len(keep), len(cls), len(merged_cls))
+    return FrameDetections(frame_index, merged_cls, merged_conf, merged_xyxy, model.names)
+
+
+def run_sliced_detection(image_path, output_path, profiler=None, **slice_args):
+    """Sliced detection on an image file; writes the annotated image to output_path."""
+    start = time.perf_counter()
+    _wait_for_warmup()
+    with profiling.stage(profiler, "decode"):
+        frame = cv2.imread(str(image_path))
+    if frame is None:
+        raise RuntimeError(f"Could not read image '{image_path}'.")
+    detections = detect_sliced(frame, profiler=profiler, **slice_args)
+    _log_first_inference(image_path, start)
+    with profiling.stage(profiler, "annotate_encode"):
+        cv2.imwrite(str(output_path), draw_detections(frame, detections))
+    return detections
+
+
+def run_detection(video_path):
+    """
+    Runs YOLO detection on a video, returns the path of the annotated video,
+    and the compact detections for ALL frames.
+    """
+    stream = stream_detections(video_path)
+    detections = list(stream)
+    return stream.annotated_output_path(), detections
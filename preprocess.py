@@ -0,0 +1,21 @@
+import cv2
+
+
+def letterbox(image, imgsz=416, color=(114, 114, 114)):
+    """
+    Resizes an image to fit imgsz x imgsz keeping the aspect ratio and pads
+    the rest. Returns the padded image, the scale and the (x, y) padding so
+    boxes can be mapped back to the original frame.
+    """
+    h, w = image.shape[:2]
+    scale = min(imgsz / h, imgsz / w)
+    new_w, new_h = int(round(w * scale)), int(round(h * scale))
+    if (new_w, new_h) != (w, h):
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+
+    pad_x, pad_y = (imgsz - new_w) // 2, (imgsz - new_h) // 2
+    image = cv2.copyMakeBorder(
+        image, pad_y, imgsz - new_h - pad_y, pad_x, imgsz - new_w - pad_x,
+        cv2.BORDER_CONSTANT, value=color
+    )
+    return image, scale, (pad_x, pad_y), (h, w)
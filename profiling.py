@@ -0,0 +1,173 @@
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+from contextlib import contextmanager, nullcontext
+
+try:
+    import psutil  # installed with ultralytics
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_INTERVAL = 0.05  # seconds between RSS samples while a request runs
+
+
+def current_rss_bytes():
+    """Current resident set size of this process, or None if unknown."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _sample_until_stopped(profiler_ref, stopped):
+    while not stopped.wait(SAMPLE_INTERVAL):
+        profiler = profiler_ref()
+        if profiler is None:
+            return
+        profiler._sample()
+        del profiler
+
+
+class Profiler:
+    """
+    Collects per-stage wall time (and optionally peak memory) for one request.
+    Stages are flat: timing the same name again accumulates into it.
+
+    With sample_memory=True, the process' current RSS is read at every stage
+    boundary and by a light background thread every SAMPLE_INTERVAL, so the
+    peaks belong to this request rather than to the whole server process.
+    """
+
+    def __init__(self, request="request", sample_memory=False):
+        self.request = request
+        self.stages = {}
+        self.peak_rss_bytes = None
+        self._start = time.perf_counter()
+        self._end = None
+        self._open_stages = {}   # name -> peak RSS while it runs
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self.sample_memory = sample_memory and current_rss_bytes() is not None
+        if self.sample_memory:
+            self._sample()
+            # The thread only holds a weak reference, so it also ends if finish() is never called
+            threading.Thread(target=_sample_until_stopped, args=(weakref.ref(self), self._stopped),
+                             name="rss-sampler", daemon=True).start()
+
+    def _sample(self):
+        rss = current_rss_bytes()
+        with self._lock:
+            self.peak_rss_bytes = max(self.peak_rss_bytes or 0, rss)
+            for name, peak in self._open_stages.items():
+                self._open_stages[name] = max(peak, rss)
+
+    def add(self, name, seconds, peak_bytes=None):
+        """Adds time measured elsewhere (e.g. Ultralytics' per-frame speed) to a stage."""
+        stage = self.stages.setdefault(name, {"seconds": 0.0, "calls": 0, "peak_bytes": None})
+        stage["seconds"] += seconds
+        stage["calls"] += 1
+        if peak_bytes is not None:
+            stage["peak_bytes"] = max(stage["peak_bytes"] or 0, peak_bytes)
+
+    @contextmanager
+    def stage(self, name):
+        """Times the enclosed block as stage `name`."""
+        if self.sample_memory:
+            with self._lock:
+                self._open_stages[name] = 0
+            self._sample()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            peak = None
+            if self.sample_memory:
+                self._sample()
+                with self._lock:
+                    peak = self._open_stages.pop(name)
+            self.add(name, seconds, peak)
+
+    def finish(self):
+        """Marks the end of the request and logs a one-line summary."""
+        self._end = time.perf_counter()
+        if self.sample_memory and not self._stopped.is_set():
+            self._stopped.set()
+            self._sample()
+        logger.info("%s: %.3fs total | %s", self.request, self.total_seconds,
+                    ", ".join(f"{name} {s['seconds']:.3f}s" for name, s in self.stages.items()))
+        return self
+
+    @property
+    def total_seconds(self):
+        return (self._end or time.perf_counter()) - self._start
+
+    def to_dict(self):
+        rss = self.peak_rss_bytes
+        return {
+            "request": self.request,
+            "total_seconds": round(self.total_seconds, 6),
+            "peak_rss_mb": round(rss / 2**20, 1) if rss is not None else None,
+            "stages": {
+                name: {
+                    "seconds": round(s["seconds"], 6),
+                    "calls": s["calls"],
+                    "peak_mb": round(s["peak_bytes"] / 2**20, 2) if s["peak_bytes"] is not None else None,
+                }
+                for name, s in self.stages.items()
+            },
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_prometheus(self):
+        """Prometheus text exposition format."""
+        request = self.request.replace("\\", "\\\\").replace('"', '\\"')
+        lines = [
+            "# HELP roadsense_stage_seconds Wall time spent in a pipeline stage.",
+            "# TYPE roadsense_stage_seconds gauge",
+        ]
+        lines += [f'roadsense_stage_seconds{{request="{request}",stage="{name}"}} {s["seconds"]:.6f}'
+                  for name, s in self.stages.items()]
+        lines += [
+            "# HELP roadsense_stage_calls Number of times a pipeline stage ran.",
+            "# TYPE roadsense_stage_calls gauge",
+        ]
+        lines += [f'roadsense_stage_calls{{request="{request}",stage="{name}"}} {s["calls"]}'
+                  for name, s in self.stages.items()]
+
+        peaks = {name: s["peak_bytes"] for name, s in self.stages.items() if s["peak_bytes"] is not None}
+        if peaks:
+            lines += [
+                "# HELP roadsense_stage_peak_bytes Peak resident memory of the process while a stage ran.",
+                "# TYPE roadsense_stage_peak_bytes gauge",
+            ]
+            lines += [f'roadsense_stage_peak_bytes{{request="{request}",stage="{name}"}} {peak}'
+                      for name, peak in peaks.items()]
+
+        lines += [
+            "# HELP roadsense_request_seconds Total wall time of the request.",
+            "# TYPE roadsense_request_seconds gauge",
+            f'roadsense_request_seconds{{request="{request}"}} {self.total_seconds:.6f}',
+        ]
+        if self.peak_rss_bytes is not None:
+            lines += [
+                "# HELP roadsense_request_peak_rss_bytes Peak resident memory of the process during the request.",
+                "# TYPE roadsense_request_peak_rss_bytes gauge",
+                f'roadsense_request_peak_rss_bytes{{request="{request}"}} {self.peak_rss_bytes}',
+            ]
+        return "\n".join(lines) + "\n"
+
+
+def stage(profiler, name):
+    """profiler.stage(name), or a no-op when profiling is off (profiler is None)."""
+    return profiler.stage(name) if profiler is not None else nullcontext()
@@ -1,22 +1,312 @@
+import contextlib
+import io
+import re
+import zlib
+from array import array
+
+from PIL import Image
 from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase.pdfmetrics import stringWidth
 from reportlab.pdfgen import canvas
 
-def generate_report(df, severity_results, filename):
-    c = canvas.Canvas(filename, pagesize=A4)
-    c.setFont("Helvetica", 12)
-    c.drawString(50, 800, "🚧 Road Damage Detection Report")
-    c.line(50, 795, 550, 795)
+from severity import SEVERITY_LEVELS, classify_severity
+
+PAGE_WIDTH, PAGE_HEIGHT = A4
+MARGIN = 50
+ROW_HEIGHT = 11
+ROWS_PER_PAGE = int((PAGE_HEIGHT - 2 * MARGIN - 40) // ROW_HEIGHT)
+
+# Detection table layout: (column, header, width in characters, format)
+ROW_FORMAT = [
+    ("Track", "Track", 6, "{:d}"),
+    ("Frame", "Frame", 7, "{:d}"),
+    ("Damage Type", "Type", 6, "{}"),
+    ("Confidence", "Conf", 6, "{:.2f}"),
+    ("Severity", "Severity", 9, "{}"),
+    ("Width", "W", 6, "{:d}"),
+    ("Height", "H", 6, "{:d}"),
+    ("First Frame", "First", 7, "{:d}"),
+    ("Last Frame", "Last", 7, "{:d}"),
+    ("Hits", "Hits", 5, "{:d}"),
+]
+
+
+def _header(c, title):
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(MARGIN, PAGE_HEIGHT - MARGIN, title)
+    c.line(MARGIN, PAGE_HEIGHT - MARGIN - 5, PAGE_WIDTH - MARGIN, PAGE_HEIGHT - MARGIN - 5)
+
+
+def _footer(c):
+    c.setFont("Helvetica", 8)
+    c.drawRightString(PAGE_WIDTH - MARGIN, MARGIN / 2, f"Page {c.getPageNumber()}")
+
+
+def _draw_table(c, x, y, header, rows, widths):
+    """Draws a small table with drawString; returns the y below it."""
+    c.setFont("Helvetica-Bold", 10)
+    for text, offset in zip(header, widths):
+        c.drawString(x + offset, y, text)
+    c.setFont("Helvetica", 10)
+    for row in rows:
+        y -= 14
+        for text, offset in zip(row, widths):
+            c.drawString(x + offset, y, text)
+    return y - 24
+
+
+def _crop_thumbnails(df, source_path, size=150):
+    """
+    Crops the boxes of df's rows out of the source image/video. Frames are
+    read in order so a video is only decoded up to the last needed frame.
+    Returns [(index, RGB thumbnail), ...]; rows that can't be read are skipped.
+    """
+    import cv2
+
+    thumbnails = []
+    cap = None
+    image = None
+    if str(source_path).lower().endswith((".mp4", ".avi", ".mov", ".mkv")):
+        cap = cv2.VideoCapture(str(source_path))
+    else:
+        image = cv2.imread(str(source_path))
+
+    frame_index, frame = -1, image
+    for row in df.sort_values("Frame").itertuples():
+        if cap is not None:
+            if row.Frame != frame_index:
+                if row.Frame != frame_index + 1:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, row.Frame)
+                ok, frame = cap.read()
+                frame_index = row.Frame
+                if not ok:
+                    continue
+        if frame is None:
+            continue
+
+        x1, y1, x2, y2 = row.Bbox
+        pad = max(x2 - x1, y2 - y1) // 4
+        crop = frame[max(y1 - pad, 0):y2 + pad, max(x1 - pad, 0):x2 + pad]
+        if crop.size == 0:
+            continue
+        scale = size / max(crop.shape[:2])
+        crop = cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        thumbnails.append((row.Index, cv2.cvtColor(crop, cv2.COLOR_BGR2RGB)))
+
+    if cap is not None:
+        cap.release()
+    return thumbnails
+
+
+def _draw_summary_page(c, df, source_path, top_n):
+    _header(c, "Road Damage Detection Report")
+    y = PAGE_HEIGHT - MARGIN - 30
+    c.setFont("Helvetica", 10)
+    c.drawString(MARGIN, y, f"Total detections: {len(df)}")
+    y -= 30
+
+    # Aggregates, computed once with groupby
+    by_class = df.groupby("Damage Type")["Confidence"].agg(["count", "mean", "max"])
+    by_severity = df.groupby("Severity").size().reindex(SEVERITY_LEVELS, fill_value=0)
+
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(MARGIN, y, "By damage type")
+    y = _draw_table(
+        c, MARGIN, y - 20, ["Type", "Count", "Avg Confidence", "Max Confidence"],
+        [[str(row.Index), str(row.count), f"{row.mean:.2f}", f"{row.max:.2f}"] for row in by_class.itertuples()],
+        [0, 80, 160, 280],
+    )
+
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(MARGIN, y, "By severity")
+    y = _draw_table(
+        c, MARGIN, y - 20, ["Severity", "Count"],
+        [[level, str(count)] for level, count in by_severity.items()],
+        [0, 80],
+    )
+
+    # Thumbnails of the most severe detections (severity is binned from
+    # confidence, so the most confident are the most severe)
+    if source_path is not None and top_n > 0:
+        top = df.nlargest(top_n, "Confidence")
+        thumbnails = _crop_thumbnails(top, source_path)
+        if thumbnails:
+            c.setFont("Helvetica-Bold", 12)
+            c.drawString(MARGIN, y, f"Top {len(thumbnails)} most severe detections")
+            thumbnails.sort(key=lambda t: -top.at[t[0], "Confidence"])
+            cell = (PAGE_WIDTH - 2 * MARGIN) / 3
+            for i, (index, thumbnail) in enumerate(thumbnails):
+                if i % 3 == 0:
+                    y -= 180
+                    if y < MARGIN:
+                        break
+                x = MARGIN + (i % 3) * cell
+                h, w = thumbnail.shape[:2]
+                c.drawImage(ImageReader(Image.fromarray(thumbnail)), x, y + 20, width=w, height=h)
+                row = top.loc[index]
+                c.setFont("Helvetica", 8)
+                c.drawString(x, y + 8, f"{row['Damage Type']} | {row['Confidence']:.2f} | "
+                                       f"{row['Severity']} | frame {row['Frame']}")
+
+    _footer(c)
+    c.showPage()
 
-    c.drawString(50, 770, "Detected Damages:")
-    y = 750
-    for i, row in df.iterrows():
-        c.drawString(50, y, f"Damage {i+1} - Class: {row['Class']} | Confidence: {row['Confidence']:.2f}")
-        y -= 20
 
-    c.drawString(50, y-20, "Severity Classification:")
-    y -= 40
-    for damage, severity in severity_results.items():
-        c.drawString(50, y, f"{damage}: {severity}")
-        y -= 20
+def _pdf_string(text):
+    """A PDF literal string in the standard fonts' WinAnsi encoding."""
+    data = str(text).encode("cp1252", errors="replace")
+    return b"(" + data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
 
+
+def _parse_summary(data):
+    """
+    Object numbers and xref offset of the single-document PDF ReportLab wrote,
+    needed to append pages to it: (root, info, size, startxref, pages, kids, id).
+    """
+    trailer = data[data.rindex(b"trailer"):]
+    root = int(re.search(rb"/Root (\d+) 0 R", trailer).group(1))
+    info = int(re.search(rb"/Info (\d+) 0 R", trailer).group(1))
+    size = int(re.search(rb"/Size (\d+)", trailer).group(1))
+    startxref = int(re.search(rb"startxref\s+(\d+)", trailer).group(1))
+    file_id = re.search(rb"/ID\s*(\[[^\]]*\])", trailer)
+    catalog = re.search(rb"\n%d 0 obj\s*<<(.*?)>>\s*endobj" % root, data, re.S).group(1)
+    pages = int(re.search(rb"/Pages (\d+) 0 R", catalog).group(1))
+    pages_dict = re.search(rb"\n%d 0 obj\s*<<(.*?)>>\s*endobj" % pages, data, re.S).group(1)
+    kids = [int(n) for n in re.findall(rb"(\d+) 0 R", re.search(rb"/Kids\s*\[([^\]]*)\]", pages_dict).group(1))]
+    return root, info, size, startxref, pages, kids, file_id.group(1) if file_id else None
+
+
+class _PageAppender:
+    """
+    Appends pages to a PDF written by ReportLab as an incremental update
+    (PDF 1.4, section 7.5.6): every page is compressed and written to the
+    output as soon as it is complete. Only the page and object offsets are
+    kept, as flat integer arrays. close() writes the updated page tree, the
+    cross-reference section and the trailer.
+    """
+
+    FONTS = {"F1": "Helvetica", "F2": "Helvetica-Bold", "F3": "Courier", "F4": "Courier-Bold"}
+
+    def __init__(self, out, summary):
+        self.out = out
+        self.position = len(summary)
+        out.write(summary)
+        root, info, size, prev_xref, self.pages, kids, file_id = _parse_summary(summary)
+        self.trailer = b"/Root %d 0 R /Info %d 0 R /Prev %d%s" % (
+            root, info, prev_xref, b" /ID " + file_id if file_id else b"")
+        self.first_number = size
+        self.offsets = array("q")   # of objects first_number, first_number + 1, ...
+        self.kids = array("q", kids)
+        self.fonts = b" ".join(
+            b"/%s %d 0 R" % (alias.encode(), self._write(
+                b"<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>" % name.encode()))
+            for alias, name in self.FONTS.items()
+        )
+
+    def _write(self, body):
+        number = self.first_number + len(self.offsets)
+        self.offsets.append(self.position)
+        self._emit(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        return number
+
+    def _emit(self, data):
+        self.out.write(data)
+        self.position += len(data)
+
+    def add_page(self, content):
+        """Writes one page with the given content stream operators."""
+        stream = zlib.compress(content)
+        contents = self._write(b"<< /Filter /FlateDecode /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        self.kids.append(self._write(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %.4f %.4f] /Resources << /Font << %s >> >> "
+            b"/Contents %d 0 R >>" % (self.pages, PAGE_WIDTH, PAGE_HEIGHT, self.fonts, contents)
+        ))
+
+    def close(self):
+        # New version of the page tree object, written in slices of Kids
+        pages_offset = self.position
+        self._emit(b"%d 0 obj\n<< /Type /Pages /Count %d /Kids [" % (self.pages, len(self.kids)))
+        for start in range(0, len(self.kids), 1000):
+            self._emit(b"".join(b"%d 0 R " % kid for kid in self.kids[start:start + 1000]))
+        self._emit(b"] >>\nendobj\n")
+
+        xref_offset = self.position
+        self._emit(b"xref\n0 1\n0000000000 65535 f \n%d 1\n%010d 00000 n \n" % (self.pages, pages_offset))
+        self._emit(b"%d %d\n" % (self.first_number, len(self.offsets)))
+        for start in range(0, len(self.offsets), 1000):
+            self._emit(b"".join(b"%010d 00000 n \n" % offset for offset in self.offsets[start:start + 1000]))
+        self._emit(b"trailer\n<< /Size %d %s >>\nstartxref\n%d\n%%%%EOF\n" % (
+            self.first_number + len(self.offsets), self.trailer, xref_offset))
+
+
+def _table_page(lines, page_number):
+    """Content stream of one detection table page, laid out like the summary page."""
+    footer = f"Page {page_number}"
+    footer_x = PAGE_WIDTH - MARGIN - stringWidth(footer, "Helvetica", 8)
+    title_y = PAGE_HEIGHT - MARGIN
+    return b"\n".join([
+        b"BT /F2 14 Tf %.2f %.2f Td %s Tj ET" % (MARGIN, title_y, _pdf_string("Detected Damages")),
+        b"%.2f %.2f m %.2f %.2f l S" % (MARGIN, title_y - 5, PAGE_WIDTH - MARGIN, title_y - 5),
+        b"BT /F4 8 Tf 9.6 TL %.2f %.2f Td %s Tj /F3 8 Tf" % (MARGIN, title_y - 25, _pdf_string(lines[0])),
+        *(b"T* %s Tj" % _pdf_string(line) for line in lines[1:]),
+        b"ET",
+        b"BT /F1 8 Tf %.2f %.2f Td %s Tj ET" % (footer_x, MARGIN / 2, _pdf_string(footer)),
+    ])
+
+
+def _write_detection_rows(pages, df, chunk_size):
+    """
+    Writes the detection table, paginated. Rows are formatted chunk by chunk
+    from the column arrays and each page is handed to `pages` as soon as it
+    is full, so memory stays bounded by one chunk and one page.
+    """
+    layout = [(col, header, width, fmt) for col, header, width, fmt in ROW_FORMAT if col in df]
+    header_line = "#".ljust(8) + "".join(header.ljust(width) for _, header, width, _ in layout) + "Bbox"
+
+    lines = [header_line]
+    page_number = len(pages.kids)
+    number = 0
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start:start + chunk_size]
+        columns = [chunk[col].to_numpy().tolist() for col, _, _, _ in layout] + [chunk["Bbox"].tolist()]
+        for values in zip(*columns):
+            number += 1
+            lines.append(str(number).ljust(8) + "".join(
+                fmt.format(value).ljust(width) for value, (_, _, width, fmt) in zip(values, layout)
+            ) + str(values[-1]))
+            if len(lines) > ROWS_PER_PAGE:
+                page_number += 1
+                pages.add_page(_table_page(lines, page_number))
+                lines = [header_line]
+
+    if len(lines) > 1:
+        pages.add_page(_table_page(lines, page_number + 1))
+
+
+def generate_report(df, filename, source_path=None, top_n=6, chunk_size=5000):
+    """
+    Writes a paginated PDF report of the detection table to filename (a path
+    or a binary file object): a summary page with per-class and per-severity
+    aggregates and thumbnails of the top_n most severe detections cropped from
+    source_path, followed by every detection.
+
+    The summary page is drawn with ReportLab. The detection pages are appended
+    to it as an incremental update and streamed to filename one page at a
+    time, so memory doesn't grow with the number of rows (beyond one object
+    offset per page).
+    """
+    if "Severity" not in df:
+        df = df.assign(Severity=classify_severity(df))
+
+    summary = io.BytesIO()
+    c = canvas.Canvas(summary, pagesize=A4, pageCompression=1)
+    c.setTitle("Road Damage Detection Report")
+    _draw_summary_page(c, df, source_path, top_n)
     c.save()
+
+    with contextlib.ExitStack() as stack:
+        out = filename if hasattr(filename, "write") else stack.enter_context(open(filename, "wb"))
+        pages = _PageAppender(out, summary.getvalue())
+        _write_detection_rows(pages, df, chunk_size)
+        pages.close()
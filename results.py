@@ -0,0 +1,74 @@
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = ["Frame", "Damage Type", "Confidence", "Width", "Height", "Bbox"]
+
+
+class FrameDetections(NamedTuple):
+    """
+    Compact detections for a single frame/image. Only the box data is kept,
+    the original frame tensor held by the Ultralytics Results object is dropped.
+    """
+    frame: int
+    cls: np.ndarray    # (N,) int class ids
+    conf: np.ndarray   # (N,) float confidences
+    xyxy: np.ndarray   # (N, 4) float pixel boxes
+    names: dict        # class id -> class name (shared, not copied)
+
+
+def concat_detections(detections):
+    """
+    Concatenates a stream of FrameDetections into flat column arrays.
+    Returns (frame, cls, conf, xyxy, names); names is None for an empty stream.
+    """
+    frames, cls_ids, confs, boxes = [], [], [], []
+    names = None
+    for frame_detections in detections:
+        names = frame_detections.names
+        n = len(frame_detections.cls)
+        if n == 0:
+            continue
+        frames.append(np.full(n, frame_detections.frame, dtype=np.int64))
+        cls_ids.append(frame_detections.cls)
+        confs.append(frame_detections.conf)
+        boxes.append(frame_detections.xyxy)
+
+    if not cls_ids:
+        return (np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.float32),
+                np.empty((0, 4), np.float32), names)
+
+    return (np.concatenate(frames), np.concatenate(cls_ids).astype(np.int64),
+            np.concatenate(confs), np.concatenate(boxes), names)
+
+
+def columns_to_dataframe(frame, cls, conf, xyxy, names):
+    """Builds the detection table from flat column arrays in one step."""
+    if len(cls) == 0:
+        return pd.DataFrame(columns=COLUMNS)
+
+    # Lookup table instead of a names[cls_id] call per box
+    lookup = np.empty(max(names) + 1, dtype=object)
+    for cls_id, name in names.items():
+        lookup[cls_id] = name
+
+    # astype truncates toward zero, the same as int() on each coordinate
+    xyxy = np.asarray(xyxy).astype(np.int64)
+    return pd.DataFrame({
+        "Frame": frame,
+        "Damage Type": lookup[cls],
+        "Confidence": np.round(np.asarray(conf, dtype=np.float64), 3),
+        "Width": xyxy[:, 2] - xyxy[:, 0],
+        "Height": xyxy[:, 3] - xyxy[:, 1],
+        "Bbox": list(map(tuple, xyxy.tolist())),
+    }, columns=COLUMNS)
+
+
+def results_to_dataframe(detections):
+    """
+    Converts a stream of FrameDetections (one per frame/image) into a single
+    pandas DataFrame. Box tensors are concatenated per frame and the table is
+    built column-wise, so there is no Python loop over individual boxes.
+    """
+    return columns_to_dataframe(*concat_detections(detections))
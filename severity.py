@@ -1,11 +1,15 @@
+import numpy as np
+import pandas as pd
+
+# Confidence thresholds, checked from the top: > 0.8 High, > 0.5 Medium, else Low
+SEVERITY_LEVELS = ["High", "Medium", "Low"]
+
+
 def classify_severity(df):
-    severity_map = {}
-    for i, row in df.iterrows():
-        if row["Confidence"] > 0.8:
-            severity = "High"
-        elif row["Confidence"] > 0.5:
-            severity = "Medium"
-        else:
-            severity = "Low"
-        severity_map[f"Damage {i+1}"] = severity
-    return severity_map
+    """
+    Returns a "Severity" column (High/Medium/Low) aligned with df's index,
+    binned from the Confidence column in one vectorized pass.
+    """
+    conf = df["Confidence"].to_numpy(dtype=np.float64)
+    severity = np.select([conf > 0.8, conf > 0.5], SEVERITY_LEVELS[:2], default=SEVERITY_LEVELS[2])
+    return pd.Series(severity, index=df.index, name="Severity")
@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+
+TRACK_COLUMNS = ["Track", "Frame", "Damage Type", "Confidence", "Width", "Height", "Bbox",
+                 "First Frame", "Last Frame", "Hits"]
+
+
+class Track:
+    """One physical defect followed across frames."""
+
+    def __init__(self, track_id, frame, cls_id, conf, xyxy):
+        self.track_id = track_id
+        self.cls = cls_id
+        self.first_frame = frame
+        self.last_frame = frame
+        self.hits = 1
+        self.xyxy = xyxy            # latest box, used for matching
+        self.best_conf = conf
+        self.best_frame = frame
+        self.best_xyxy = xyxy
+
+    def update(self, frame, conf, xyxy):
+        self.last_frame = frame
+        self.hits += 1
+        self.xyxy = xyxy
+        if conf > self.best_conf:
+            self.best_conf = conf
+            self.best_frame = frame
+            self.best_xyxy = xyxy
+
+
+def iou_matrix(a, b):
+    """Pairwise IoU between (N, 4) and (M, 4) xyxy boxes."""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def centroid_distance_matrix(a, b):
+    """
+    Pairwise centroid distance between (N, 4) and (M, 4) xyxy boxes, relative
+    to the diagonal of the boxes in a, so it is independent of resolution.
+    """
+    ca = (a[:, :2] + a[:, 2:]) / 2
+    cb = (b[:, :2] + b[:, 2:]) / 2
+    diag = np.hypot(a[:, 2] - a[:, 0], a[:, 3] - a[:, 1])
+    return np.linalg.norm(ca[:, None] - cb[None, :], axis=2) / np.maximum(diag[:, None], 1e-9)
+
+
+def _greedy_match(score, threshold, higher_is_better=True):
+    """Greedy one-to-one assignment on a score matrix. Returns [(row, col), ...]."""
+    score = score.astype(np.float64, copy=True) if higher_is_better else -score.astype(np.float64)
+    threshold = threshold if higher_is_better else -threshold
+    matches = []
+    while score.size:
+        row, col = np.unravel_index(np.argmax(score), score.shape)
+        if score[row, col] < threshold:
+            break
+        matches.append((row, col))
+        score[row, :] = -np.inf
+        score[:, col] = -np.inf
+    return matches
+
+
+class IoUTracker:
+    """
+    Lightweight class-aware tracker. Detections are linked to active tracks by
+    IoU first, then by centroid distance (boxes move and grow quickly as a
+    dashcam approaches a defect, so IoU alone drops tracks between sampled frames).
+    A track ends once it hasn't been seen for more than max_gap frames.
+    """
+
+    def __init__(self, iou_threshold=0.3, centroid_threshold=0.5, max_gap=30):
+        self.iou_threshold = iou_threshold
+        self.centroid_threshold = centroid_threshold
+        self.max_gap = max_gap
+        self.active = []
+        self.finished = []
+        self._next_id = 1
+
+    def update(self, frame_detections):
+        frame = frame_detections.frame
+
+        # Retire tracks that have been gone too long
+        still_active = []
+        for track in self.active:
+            (still_active if frame - track.last_frame <= self.max_gap else self.finished).append(track)
+        self.active = still_active
+
+        unmatched = set(range(len(frame_detections.cls)))
+        if self.active and unmatched:
+            track_boxes = np.array([t.xyxy for t in self.active], dtype=np.float32)
+            track_cls = np.array([t.cls for t in self.active])
+            same_class = track_cls[:, None] == frame_detections.cls[None, :]
+
+            iou = np.where(same_class, iou_matrix(track_boxes, frame_detections.xyxy), 0.0)
+            matches = _greedy_match(iou, self.iou_threshold)
+
+            # Second pass on what's left, by centroid distance
+            matched_rows = {r for r, _ in matches}
+            matched_cols = {c for _, c in matches}
+            dist = np.where(same_class, centroid_distance_matrix(track_boxes, frame_detections.xyxy), np.inf)
+            dist[list(matched_rows), :] = np.inf
+            dist[:, list(matched_cols)] = np.inf
+            matches += _greedy_match(dist, self.centroid_threshold, higher_is_better=False)
+
+            for row, col in matches:
+                self.active[row].update(frame, float(frame_detections.conf[col]), frame_detections.xyxy[col])
+                unmatched.discard(col)
+
+        for col in sorted(unmatched):
+            self.active.append(Track(
+                self._next_id, frame, int(frame_detections.cls[col]),
+                float(frame_detections.conf[col]), frame_detections.xyxy[col]
+            ))
+            self._next_id += 1
+
+    def tracks(self):
+        """All tracks seen so far, finished and active, in order of appearance."""
+        return sorted(self.finished + self.active, key=lambda t: t.track_id)
+
+
+def track_detections(detections, **tracker_args):
+    """Runs a stream of FrameDetections through an IoUTracker and returns its tracks."""
+    tracker = IoUTracker(**tracker_args)
+    for frame_detections in detections:
+        tracker.update(frame_detections)
+    return tracker.tracks()
+
+
+def tracks_to_dataframe(tracks, names):
+    """
+    One row per tracked defect. Frame, Confidence and Bbox are those of the
+    track's best (most confident) detection.
+    """
+    if not tracks:
+        return pd.DataFrame(columns=TRACK_COLUMNS)
+
+    best_xyxy = np.array([t.best_xyxy for t in tracks]).astype(np.int64)
+    return pd.DataFrame({
+        "Track": [t.track_id for t in tracks],
+        "Frame": [t.best_frame for t in tracks],
+        "Damage Type": [names[t.cls] for t in tracks],
+        "Confidence": np.round([t.best_conf for t in tracks], 3),
+        "Width": best_xyxy[:, 2] - best_xyxy[:, 0],
+        "Height": best_xyxy[:, 3] - best_xyxy[:, 1],
+        "Bbox": list(map(tuple, best_xyxy.tolist())),
+        "First Frame": [t.first_frame for t in tracks],
+        "Last Frame": [t.last_frame for t in tracks],
+        "Hits": [t.hits for t in tracks],
+    }, columns=TRACK_COLUMNS)